@@ -0,0 +1,25 @@
+"""Gunicorn configuration for serving the API with Uvicorn workers"""
+
+import os
+import multiprocessing
+
+
+# Server
+bind = f"0.0.0.0:{os.getenv('PORT', '3000')}"
+worker_class = 'uvicorn.workers.UvicornWorker'
+workers = int(os.getenv('WEB_CONCURRENCY', 2 * multiprocessing.cpu_count() + 1))
+
+# Import the app, and load the model, once in the master so workers share it copy-on-write
+preload_app = True
+
+
+def when_ready(server):
+    """Load the model in the master process before the workers are forked"""
+    from src.app.api import load_model
+    load_model()
+
+
+def post_fork(server, worker):
+    """Give each worker its own S3 connections instead of the ones inherited from the master"""
+    from src.app.api import storage
+    storage.connect()
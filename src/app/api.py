@@ -1,26 +1,30 @@
 """Start application"""
 
 import os
-import sys
-sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', '..'))
-
+import asyncio
+import functools
 import threading
 import uvicorn
-import pandas as pd
+import numpy as np
 
+from typing import TYPE_CHECKING
 from loguru import logger
 from datetime import datetime
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from http import HTTPStatus
 from mangum import Mangum
 
 from src.config import Def
 from src.app.interface import CarInterface
-from src.utils.utilities import UtilityManager
-from src.pricing.model import PricingModel
-from src.data.dataset import DatasetManager
+from src.utils.utilities import create_json_response, json_response_err, json_response_ok
 from src.app.database import StorageS3
+from src.app.batcher import PredictionBatcher
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from src.pricing.model import PricingModel
+    from src.data.dataset import DatasetManager
 
 
 # API
@@ -28,7 +32,8 @@ from src.app.database import StorageS3
 app = FastAPI(
     title='ML Component for Car Pricing',
     description='Machine Learning Component for Predicting Car Prices',
-    version="1.0"
+    version="1.0",
+    default_response_class=ORJSONResponse
 )
 
 
@@ -37,47 +42,153 @@ app = FastAPI(
 storage = StorageS3(
     bucket=Def.DB.S3_BUCKET,
     region=Def.Host.REGION,
-    profile=Def.Host.PROFILE
+    profile=Def.Host.PROFILE,
+    latest_ttl=Def.DB.LATEST_TTL
 )
 
 
+# FEATURES
+
+# Record layout of a request row, integer and float fields of the interface keep their types and the rest are objects
+FIELD_TYPES = {int: np.int64, float: np.float64}
+FEATURE_RECORD = np.dtype([
+    (field.alias, FIELD_TYPES.get(field.annotation, object))
+    for field in CarInterface.model_fields.values()
+])
+
+# Names of all features are fixed, so they are listed once for the /values endpoint
+FEATURE_NAMES = tuple(Def.Data.validator().keys())
+
+
+# LAZY IMPORTS
+
+@functools.cache
+def pricing_model_class() -> type['PricingModel']:
+    """Import the pricing model on first use, so endpoints without a model do not load the ML libraries
+
+    Returns:
+        type[PricingModel]: Pricing model class
+    """
+    from src.pricing.model import PricingModel
+    return PricingModel
+
+
+@functools.cache
+def dataset_manager_class() -> type['DatasetManager']:
+    """Import the dataset manager on first use, so endpoints without a model do not load the ML libraries
+
+    Returns:
+        type[DatasetManager]: Dataset manager class
+    """
+    from src.data.dataset import DatasetManager
+    return DatasetManager
+
+
 # MODELS
 
-model = None
-model_version = None
+# Readers take a consistent (model, version) snapshot from model_ref[0] without locking,
+# writers build the new model aside and publish it with a single reference swap.
+model_ref: list[tuple['PricingModel', str]] = [(None, None)]
 model_lock = threading.Lock()
 
 
-def load_model() -> PricingModel:
-    """Get and load the latest remote model
+def load_model() -> tuple['PricingModel', str]:
+    """Get and load the latest remote model, if it has changed, and publish it in `model_ref`.
+        It performs blocking S3 and disk I/O, so async endpoints run it in a worker thread.
 
     Returns:
-        PricingModel: Latest loaded model
+        tuple[PricingModel, str]: Latest loaded model and its version
     """
-    global model, model_version
-
     with model_lock:
+        current_model, current_version = model_ref[0]
 
         # Local model
         if Def.Env.IS_LOCAL:
-            model = PricingModel(dataset=None)
-            model.load(path=Def.Model.Dir.PATH)
-            return model
+            if current_model is None:
+                model = pricing_model_class()(dataset=None)
+                model.load(path=Def.Model.Dir.PATH)
+                model_ref[0] = (model, None)
+            return model_ref[0]
     
         # Check does need update
-        current_model_version = storage.find_latest_file(prefix='models')
+        latest_version = storage.find_latest_file(prefix='models')
         
-        if model_version != current_model_version:
-            model_version = current_model_version
-            
-            # Download model
-            model_path = storage.download_model(remote_dir='models', local_dir=Def.Model.Dir.TEMP_MAIN)
+        if latest_version != current_version:
+            # Download model into memory
+            model_file = storage.download_model_bytes(remote_dir='models')
             
             # Load model
-            model = PricingModel(dataset=None)
-            model.load(path=model_path)
+            model = pricing_model_class()(dataset=None)
+            model.load_fileobj(file=model_file)
+            
+            # Publish model
+            model_ref[0] = (model, latest_version)
+    
+    return model_ref[0]
+
+
+async def preload_model() -> None:
+    """Load the model in the background, so startup does not wait for the download and ML imports"""
+    try:
+        await storage.run(load_model)
+    except Exception as ex:
+        logger.error(f'Failed to preload model: {ex}')
+
+
+async def refresh_model() -> None:
+    """Periodically check for a new model version and swap it in"""
+    while True:
+        await asyncio.sleep(Def.Model.REFRESH_SEC)
+        try:
+            await storage.run(load_model)
+        except Exception as ex:
+            logger.error(f'Failed to refresh model: {ex}')
+
+
+def predict_batch(input_data: 'pd.DataFrame') -> tuple[list[int], str]:
+    """Predict prepared rows with the current model
+
+    Args:
+        input_data (pd.DataFrame): Prepared rows of the batch
+
+    Returns:
+        tuple[list[int], str]: Predicted prices and version of the model which made them
+    """
+    model, model_version = model_ref[0]
+    if model is None:
+        model, model_version = load_model()
     
-    return model
+    predictions = model.predict(input_data=input_data, is_prepared=True)
+    return predictions.tolist(), model_version
+
+
+# BATCHING
+
+batcher = PredictionBatcher(
+    predict=predict_batch,
+    max_size=Def.Model.BATCH_SIZE,
+    max_wait=Def.Model.BATCH_WAIT_SEC
+)
+
+
+# EVENTS
+
+@app.on_event('startup')
+async def startup() -> None:
+    """Start preloading and refreshing the model in the background, and start batching predictions.
+        Mangum runs the lifespan on every Lambda invocation, so warm containers check for a new version here as well.
+        Requests which need the model before the preload finishes wait for it in `load_model`.
+    """
+    app.state.preload_task = asyncio.create_task(preload_model())
+    app.state.refresh_task = asyncio.create_task(refresh_model())
+    batcher.start()
+
+
+@app.on_event('shutdown')
+async def shutdown() -> None:
+    """Stop refreshing the model and batching predictions"""
+    app.state.refresh_task.cancel()
+    batcher.stop()
 
 
 # ENDPOINTS
@@ -90,7 +201,7 @@ def ping() -> JSONResponse:
     
         JSONResponse: Message
     """
-    response = UtilityManager.Response.json_response_ok(Def.Label.API.PING_SUCCESSFUL)
+    response = json_response_ok(Def.Label.API.PING_SUCCESSFUL)
     return response
 
 
@@ -113,18 +224,18 @@ def allowed_values(feature: str = None) -> JSONResponse:
     """
     # List of features
     if not feature:
-        response = UtilityManager.Response.create_json_response(
-            content=list(Def.Data.VALIDATOR.keys())
+        response = create_json_response(
+            content=FEATURE_NAMES
         )
         return response
     
     # Values per feature
-    if feature in Def.Data.VALIDATOR:
-        response = UtilityManager.Response.create_json_response(
-            content=Def.Data.VALIDATOR[feature]
+    if feature in Def.Data.validator():
+        response = create_json_response(
+            content=Def.Data.validator()[feature]
         )
     else:
-        response = UtilityManager.Response.json_response_err(
+        response = json_response_err(
             message=f"Feature '{feature}' not found",
             status=HTTPStatus.BAD_REQUEST
         )
@@ -133,7 +244,7 @@ def allowed_values(feature: str = None) -> JSONResponse:
 
 
 @app.post('/pricing')
-def car_pricing(request: CarInterface) -> JSONResponse:
+async def car_pricing(request: CarInterface) -> JSONResponse:
     """Predict car price for given input features
     
     Args:
@@ -144,38 +255,37 @@ def car_pricing(request: CarInterface) -> JSONResponse:
     
         JSONResponse: Price of the car
     """
+    import pandas as pd
+    
     try:
-        # Load the latest model
-        model = load_model()
-        
         # Prepare request
         car_data = request.model_dump(by_alias=True)
-        input_df = pd.DataFrame([car_data]) 
+        input_row = np.empty(1, dtype=FEATURE_RECORD)
+        input_row[0] = tuple(car_data[feature] for feature in FEATURE_RECORD.names)
         
         # Prepare data
-        dataset = DatasetManager(path='inference', target='Price', df=input_df, is_inference=True)
-        dataset.execute_preparation(to_save=False)
+        input_df = dataset_manager_class().prepare_instance(df=pd.DataFrame(input_row, copy=False), target='Price')
         
-        # Predict with model
-        predictions = model.predict(input_data=dataset.df)
+        # Predict with model, together with concurrent requests
+        prediction, model_version = await batcher.submit(row=input_df)
         
         # Create response
         content = {
-            'carPrice': predictions.tolist(),
+            'carPrice': [prediction],
             'modelVersion': model_version
         }
-        response = UtilityManager.Response.create_json_response(content=content)
+        response = create_json_response(content=content)
     
     except ValueError as ex:
         message = str(ex)
         logger.error(Def.Label.API.PRICING_INVALID_INSTANCE + '\n' + message)
-        response = UtilityManager.Response.json_response_err(
+        response = json_response_err(
             message=message, status=HTTPStatus.BAD_REQUEST
         )
     
     except Exception as ex:
         logger.error(str(ex))
-        response = UtilityManager.Response.json_response_err(
+        response = json_response_err(
             message=Def.Label.API.PRICING_PREDICTION_FAILED, status=HTTPStatus.INTERNAL_SERVER_ERROR
         )
     
@@ -183,7 +293,7 @@ def car_pricing(request: CarInterface) -> JSONResponse:
 
 
 @app.post('/train_job')
-def create_training_job() -> JSONResponse:
+async def create_training_job() -> JSONResponse:
     """Create a training job for the model with the latest dataset version
     
     Returns:
@@ -194,24 +304,25 @@ def create_training_job() -> JSONResponse:
     # In real-world scenario, this will extend the current dataset with the most recent car transactions
     
     # Find the latest
-    current_dataset_path = storage.find_latest_file(prefix='data/raw')
+    current_dataset_path = await storage.afind_latest_file(prefix='data/raw')
     
     if current_dataset_path is None:
-        response = UtilityManager.Response.json_response_err(
+        response = json_response_err(
             message=Def.Label.API.TRAINING_JOB_FAILED, status=HTTPStatus.INTERNAL_SERVER_ERROR)
         return response
     
     # Copy new version
     timestamp = datetime.now().strftime('%Y-%m-%d_%H:%M:%S')
-    new_dataset_path = f'{current_dataset_path.split("_")[0]}_{timestamp}.csv' if '_' in current_dataset_path else f'{current_dataset_path[:-4]}_{timestamp}.csv'
-    creation_status = storage.copy_file(current_dataset_path, new_dataset_path)
+    new_dataset_path = f'{current_dataset_path.partition("_")[0]}_{timestamp}.csv' if '_' in current_dataset_path else f'{current_dataset_path[:-4]}_{timestamp}.csv'
+    creation_status = await storage.acopy_file(current_dataset_path, new_dataset_path)
     
     # Create response
     if creation_status:
-        response = UtilityManager.Response.json_response_ok(
+        storage.invalidate(prefix='data/raw')
+        response = json_response_ok(
             message=Def.Label.API.TRAINING_JOB_SUCCESSFUL)
     else:
-        response = UtilityManager.Response.json_response_err(
+        response = json_response_err(
             message=Def.Label.API.TRAINING_JOB_FAILED, status=HTTPStatus.INTERNAL_SERVER_ERROR)
     
     return response
@@ -221,10 +332,11 @@ def create_training_job() -> JSONResponse:
 handler = Mangum(app)
 
 
-# Debugging
-if Def.Env.DEBUG:
+# Local server, use gunicorn_conf.py to serve it with Gunicorn
+if __name__ == '__main__':
     uvicorn.run(
-        app=app,
+        app='src.app.api:app',
         host=Def.Host.NAME,
-        port=Def.Host.PORT
+        port=Def.Host.PORT,
+        workers=int(os.getenv('WEB_CONCURRENCY', os.cpu_count()))
     )
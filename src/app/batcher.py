@@ -0,0 +1,112 @@
+"""Prediction Batcher"""
+
+import asyncio
+
+from typing import TYPE_CHECKING, Any, Callable
+from loguru import logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class PredictionBatcher:
+    """Groups concurrent prediction requests into a single model call"""
+
+    def __init__(
+            self,
+            predict: Callable[['pd.DataFrame'], tuple[list[Any], Any]],
+            max_size: int,
+            max_wait: float
+    ) -> None:
+        """Initialize prediction batcher
+
+        Args:
+            predict (Callable[[pd.DataFrame], tuple[list[Any], Any]]): Blocking function which predicts
+                all rows of the prepared batch and returns predictions with the model version
+            max_size (int): Maximum number of rows in a batch
+            max_wait (float): Maximum seconds to wait for more rows after the first one arrives
+
+        Returns:
+            None
+        """
+        self.predict = predict
+        self.max_size = max_size
+        self.max_wait = max_wait
+
+        self.queue = None
+        self.task = None
+        return
+
+    def start(self) -> None:
+        """Start consuming requests, it must be called within the running event loop"""
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._consume())
+        return
+
+    def stop(self) -> None:
+        """Stop consuming requests"""
+        if self.task is not None:
+            self.task.cancel()
+        return
+
+    async def submit(self, row: 'pd.DataFrame') -> tuple[Any, Any]:
+        """Predict the given prepared row as part of the next batch
+
+        Args:
+            row (pd.DataFrame): Prepared single-row dataset
+
+        Returns:
+            tuple[Any, Any]: Prediction for the row and the model version which made it
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((row, future))
+        return await future
+
+    async def _consume(self) -> None:
+        """Collect queued rows into batches and predict them"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            # Wait for the first row, then for more until the batch is full or the window closes
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(items) < self.max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self.queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._dispatch(items)
+
+    async def _dispatch(self, items: list[tuple['pd.DataFrame', asyncio.Future]]) -> None:
+        """Predict one batch and resolve the waiting requests
+
+        Args:
+            items (list[tuple[pd.DataFrame, asyncio.Future]]): Queued rows with their futures
+
+        Returns:
+            None
+        """
+        import pandas as pd
+        
+        rows, futures = zip(*items)
+
+        try:
+            batch = pd.concat(rows, ignore_index=True)
+            predictions, version = await asyncio.to_thread(self.predict, batch)
+
+        except Exception as ex:
+            logger.error(f'Failed prediction of the batch with {len(items)} rows: {ex}')
+            for future in futures:
+                if not future.done():
+                    future.set_exception(ex)
+            return
+
+        for future, prediction in zip(futures, predictions):
+            if not future.done():
+                future.set_result((prediction, version))
+        return
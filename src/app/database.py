@@ -1,29 +1,38 @@
 """Database"""
 
 import os
-import sys
-sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', '..'))
-
 import io
-import json
+import time
+import asyncio
+import functools
+import threading
+import orjson
 import boto3 as aws
-import pandas as pd
 
-from typing import Any
+from typing import TYPE_CHECKING, Any, Callable
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 from src.config import Def, logger
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 
 class StorageS3:
     """API for AWS S3 storage"""
     
-    def __init__(self, bucket: str, region: str, profile: str = None) -> None:
+    def __init__(self, bucket: str, region: str, profile: str = None, latest_ttl: float = 0) -> None:
         """Initialize S3 storage
 
         Args:
             * bucket (str): AWS S3 bucket name
             * region (str): AWS region name
             * profile (str): AWS Profile name
+            * latest_ttl (float): Seconds to reuse the latest file found per prefix. Defaults to 0 (disabled).
             
         Returns:
             None
@@ -31,15 +40,57 @@ class StorageS3:
         self.bucket = bucket
         self.region = region
         self.profile = profile
+        self.latest_ttl = latest_ttl
         
-        self.session = aws.Session(profile_name=self.profile) if self.profile and Def.Env.IS_LOCAL else aws.Session()
+        self.extra_args = {'StorageClass': 'STANDARD'}
+        self.client_config = Config(
+            max_pool_connections=Def.DB.Connection.MAX_POOL_CONNECTIONS,
+            retries={'max_attempts': Def.DB.Connection.MAX_ATTEMPTS, 'mode': 'adaptive'},
+            tcp_keepalive=True,
+            connect_timeout=Def.DB.Connection.CONNECT_TIMEOUT,
+            read_timeout=Def.DB.Connection.READ_TIMEOUT
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=Def.DB.Transfer.MULTIPART_THRESHOLD,
+            multipart_chunksize=Def.DB.Transfer.CHUNK_SIZE,
+            max_concurrency=Def.DB.Transfer.MAX_CONCURRENCY,
+            use_threads=True
+        )
         
-        self.conn = self.session.resource('s3', region_name=self.region)
-        self.client = self.session.client('s3', region_name=self.region)
+        self._latest_cache: dict[str, tuple[float, str]] = {}
+        self._latest_locks: dict[str, threading.Lock] = {}
+        self._latest_locks_guard = threading.Lock()
         
-        self.extra_args = {'StorageClass': 'STANDARD'}
+        self.connect()
+        return
+
+    def connect(self) -> None:
+        """Create the AWS session with S3 resource and client, and the thread pool for non-blocking calls.
+            The resource and client share the same tuned configuration, and each keeps a pool of warm keep-alive connections.
+            Call it again in a forked process, so it does not share open connections with its parent.
+        """
+        self.session = aws.Session(profile_name=self.profile) if self.profile and Def.Env.IS_LOCAL else aws.Session()
+        
+        self.conn = self.session.resource('s3', region_name=self.region, config=self.client_config)
+        self.client = self.session.client('s3', region_name=self.region, config=self.client_config)
+        self.executor = ThreadPoolExecutor(max_workers=Def.DB.Connection.MAX_WORKERS, thread_name_prefix='s3')
         return
 
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking call in the bounded S3 thread pool without blocking the event loop.
+            The pool size caps the number of concurrent S3 calls, so bursts queue up instead of thrashing.
+
+        Args:
+            * func (Callable): Blocking function to call
+            * args (Any): Positional arguments of the function
+            * kwargs (Any): Keyword arguments of the function
+
+        Returns:
+            * Any: Result of the function
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
 
     def clean_bucket(self) -> None:
         """Delete all items in the bucket"""
@@ -58,24 +109,24 @@ class StorageS3:
 
         Args:
             content (dict): Content about version to save
-            timestamp (str): Timestamp to be used as file name
+            timestamp (str): ISO timestamp to be used as file name and date partition
 
         Returns:
             bool: True if predictions are successfully saved, otherwise False
         """
         try:
             file_name = f'{timestamp}.json'
-            to_path = os.path.join(Def.DB.VERSION_DIR, file_name)
-            body = json.dumps(content)
+            date_partition = datetime.fromisoformat(timestamp).strftime('%Y/%m/%d')
+            to_path = os.path.join(Def.DB.VERSION_DIR, date_partition, file_name)
+            body = orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
             
-            obj = self.conn.Object(self.bucket, to_path)
-            obj.put(Body=body, **self.extra_args)
-            obj.wait_until_exists()
+            # S3 is read-after-write consistent, so the object is not polled after the put
+            self.client.put_object(Bucket=self.bucket, Key=to_path, Body=body, ContentType='application/json', **self.extra_args)
 
             logger.info(f'Saved version info to {self.bucket}/{to_path}')
             return True
 
-        except Exception as err:
+        except (ClientError, BotoCoreError, orjson.JSONEncodeError) as err:
             message = Def.Label.Storage.PREDS_NOT_SAVED
             logger.error(message)
             logger.error(err)
@@ -84,6 +135,7 @@ class StorageS3:
 
     def find_latest_file(self, prefix: str) -> str:
         """Find the latest file in the given path within the bucket.
+            The result is reused for `latest_ttl` seconds and concurrent lookups of the same prefix share one S3 call.
 
         Args:
             * prefix (str): The path prefix to search for files
@@ -91,24 +143,193 @@ class StorageS3:
         Returns:
             * str: The key of the latest modified file
         """
+        if self.latest_ttl <= 0:
+            return self._list_latest_file(prefix=prefix)
+        
+        latest_key = self._get_cached_latest(prefix=prefix)
+        if latest_key is not None:
+            return latest_key
+        
+        with self._get_latest_lock(prefix=prefix):
+            # Another thread may have refreshed it meanwhile
+            latest_key = self._get_cached_latest(prefix=prefix)
+            if latest_key is not None:
+                return latest_key
+            
+            latest_key = self._list_latest_file(prefix=prefix)
+            if latest_key is not None:
+                self._latest_cache[prefix] = (time.monotonic(), latest_key)
+            
+            return latest_key
+
+    def invalidate(self, prefix: str) -> None:
+        """Forget the cached latest file for the given prefix
+
+        Args:
+            * prefix (str): The path prefix to invalidate
+            
+        Returns:
+            None
+        """
+        self._latest_cache.pop(prefix, None)
+        return
+
+    def _get_cached_latest(self, prefix: str) -> str:
+        """Return the cached latest file if it has not expired yet"""
+        cached = self._latest_cache.get(prefix)
+        if cached is not None and time.monotonic() - cached[0] < self.latest_ttl:
+            return cached[1]
+        return None
+
+    def _get_latest_lock(self, prefix: str) -> threading.Lock:
+        """Return the lock used to coalesce lookups of the given prefix"""
+        with self._latest_locks_guard:
+            return self._latest_locks.setdefault(prefix, threading.Lock())
+
+    def _list_latest_file(self, prefix: str) -> str:
+        """Find the latest file in the given path within the bucket.
+            Prefixes listed in `Def.DB.SORTED_PREFIXES` hold keys with sortable timestamps, so their latest file is the greatest key,
+            while other prefixes take the most recently modified file.
+            Prefixes listed in `Def.DB.LATEST_POINTERS` are resolved with a single read of their pointer object.
+
+        Args:
+            * prefix (str): The path prefix to search for files
+            
+        Returns:
+            * str: The key of the latest file
+        """
         try:
-            bucket = self.conn.Bucket(self.bucket)
-            files = list(bucket.objects.filter(Prefix=prefix))
+            if prefix in Def.DB.LATEST_POINTERS:
+                latest_key = self._read_latest_pointer(prefix=prefix)
+                if latest_key is not None:
+                    logger.info(f"Found the latest file at {latest_key}")
+                    return latest_key
+            
+            if prefix in Def.DB.SORTED_PREFIXES:
+                latest_key = self.find_latest_file_sorted(prefix=prefix)
+            else:
+                latest_key = self.find_latest_file_modified(prefix=prefix)
             
-            if not files:
+            if latest_key is None:
                 return None
             
-            latest_file = max(files, key=lambda x: x.last_modified)
-            logger.info(f"Found the latest dataset at {latest_file.key}")
+            logger.info(f"Found the latest file at {latest_key}")
                         
-            return latest_file.key
+            return latest_key
 
         except Exception as ex:
             logger.error(f"Error finding latest file: {ex}")
             return None
+
+    def find_latest_file_modified(self, prefix: str) -> str:
+        """Find the most recently modified key under the given prefix.
+            It lists every object of the prefix, so it suits prefixes with keys which do not embed a timestamp,
+            such as datasets uploaded from outside the component.
+
+        Args:
+            * prefix (str): The path prefix to search for files
+            
+        Returns:
+            * str: The most recently modified key, or None if there are no files
+        """
+        paginator = self.client.get_paginator('list_objects_v2')
+        
+        latest_file = None
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix.rstrip('/') + '/', PaginationConfig={'PageSize': 1000}):
+            page_file = max(page.get('Contents', []), key=itemgetter('LastModified'), default=None)
+            if page_file is not None and (latest_file is None or page_file['LastModified'] > latest_file['LastModified']):
+                latest_file = page_file
+        
+        return latest_file['Key'] if latest_file is not None else None
+
+    def find_latest_file_sorted(self, prefix: str) -> str:
+        """Find the greatest key under the given prefix by descending into the greatest sub-directory on each level.
+            Keys partitioned by date, such as `version/2024/05/01/...`, are found by listing one partition per level
+            instead of every object, while a flat prefix takes a single listing.
+
+        Args:
+            * prefix (str): The path prefix to search for files
+            
+        Returns:
+            * str: The greatest key, or None if there are no files
+        """
+        paginator = self.client.get_paginator('list_objects_v2')
+        
+        # The prefix is listed as a directory, so sibling keys such as `models_old/` are not matched
+        level = prefix.rstrip('/') + '/'
+        
+        while True:
+            latest_key = None
+            latest_dir = None
+            
+            # Keep only the running maximum of files and sub-directories while paging, taking each page maximum at C level
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=level, Delimiter='/', PaginationConfig={'PageSize': 1000}):
+                page_key = max(map(itemgetter('Key'), page.get('Contents', [])), default=None)
+                if page_key is not None and (latest_key is None or page_key > latest_key):
+                    latest_key = page_key
+                
+                page_dir = max(map(itemgetter('Prefix'), page.get('CommonPrefixes', [])), default=None)
+                if page_dir is not None and (latest_dir is None or page_dir > latest_dir):
+                    latest_dir = page_dir
+            
+            # A sub-directory greater than every file on this level holds the greatest key
+            if latest_dir is None or (latest_key is not None and latest_key > latest_dir):
+                return latest_key
+            
+            level = latest_dir
+
+    def _get_pointer_key(self, prefix: str) -> str:
+        """Return the key of the object pointing to the latest file of the given prefix"""
+        return f"{Def.DB.LATEST_DIR}/{prefix.strip('/')}"
+
+    def _read_latest_pointer(self, prefix: str) -> str:
+        """Read the key of the latest file from the pointer object of the given prefix
+
+        Args:
+            * prefix (str): The path prefix of the pointer
+            
+        Returns:
+            * str: The key of the latest file, or None if the pointer does not exist
+        """
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._get_pointer_key(prefix=prefix))
+            return response['Body'].read().decode('utf-8')
+        
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+    def _write_latest_pointer(self, prefix: str, key: str) -> None:
+        """Point the given prefix to its latest file
+
+        Args:
+            * prefix (str): The path prefix of the pointer
+            * key (str): The key of the latest file
+            
+        Returns:
+            None
+        """
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._get_pointer_key(prefix=prefix),
+            Body=key.encode('utf-8'),
+            ContentType='text/plain'
+        )
+        return
+
+    async def afind_latest_file(self, prefix: str) -> str:
+        """Find the latest file without blocking the event loop
+
+        Args:
+            * prefix (str): The path prefix to search for files
+            
+        Returns:
+            * str: The key of the latest modified file
+        """
+        return await self.run(self.find_latest_file, prefix=prefix)
         
     def copy_file(self, src_key: str, dest_key: str) -> bool:
-        """Copy a file to another location with.
+        """Copy a file to another location with a single server-side request.
+            Objects above the single copy limit (5 GB) are copied with the managed multipart transfer in parallel parts.
 
         Args:
             * src_key (str): The key of the source file to copy
@@ -122,7 +343,12 @@ class StorageS3:
                 'Bucket': self.bucket,
                 'Key': src_key
             }
-            self.client.copy(copy_source, self.bucket, dest_key, ExtraArgs=self.extra_args)
+            try:
+                self.client.copy_object(Bucket=self.bucket, Key=dest_key, CopySource=copy_source, **self.extra_args)
+            except ClientError as ex:
+                if ex.response['Error']['Code'] != 'InvalidRequest':
+                    raise
+                self.client.copy(copy_source, self.bucket, dest_key, ExtraArgs=self.extra_args, Config=self.transfer_config)
             logger.info(f"Copied data from {src_key} to {dest_key}")
             return True
 
@@ -130,6 +356,18 @@ class StorageS3:
             logger.error(f"Error copying file: {ex}")
             return False
 
+    async def acopy_file(self, src_key: str, dest_key: str) -> bool:
+        """Copy a file to another location without blocking the event loop
+
+        Args:
+            * src_key (str): The key of the source file to copy
+            * dest_key (str): The key of the destination file
+            
+        Returns:
+            * bool: True if the copy operation was successful, False otherwise
+        """
+        return await self.run(self.copy_file, src_key=src_key, dest_key=dest_key)
+
 
     def get_object(self, path: str) -> Any:
         """Retrieve object from the given path
@@ -157,33 +395,114 @@ class StorageS3:
         Returns:
             Any: Object
         """
-        content = self.get_object(path=path)
-        raw_data = io.StringIO(content)
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+        
+        response = self.client.get_object(Bucket=self.bucket, Key=path)
+        
+        # Parse the body with the multithreaded Arrow reader while it downloads, then convert to NumPy-backed pandas
+        table = pacsv.read_csv(
+            pa.PythonFile(response['Body'], mode='r'),
+            read_options=pacsv.ReadOptions(use_threads=True, block_size=Def.DB.Transfer.CHUNK_SIZE),
+            convert_options=pacsv.ConvertOptions(strings_can_be_null=True)
+        )
+        df = table.to_pandas()
+        logger.info(f"Dataset downloaded from {self.bucket}/{path}")
+        
+        return df
+
+    def get_dataframe_from_parquet(self, path: str) -> Any:
+        """Retrieve Parquet dataset from the given path, restoring the column types it was saved with
+
+        Args:
+            path (str): Path to the object
+
+        Returns:
+            Any: Object
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        response = self.client.get_object(Bucket=self.bucket, Key=path)
         
-        df = pd.read_csv(raw_data, header=0)
+        # Parquet keeps its metadata in the footer, so the file is read whole before decoding
+        table = pq.read_table(pa.py_buffer(response['Body'].read()))
+        df = table.to_pandas()
         logger.info(f"Dataset downloaded from {self.bucket}/{path}")
         
         return df
 
-    def upload_dataframe_as_csv(self, path: str, df: pd.DataFrame) -> None:
-        """Uploads an object to an S3 bucket.
+    def get_dataframe(self, path: str) -> Any:
+        """Retrieve dataset from the given path in the format given by its extension, CSV or Parquet
+
+        Args:
+            path (str): Path to the object
+
+        Returns:
+            Any: Object
+        """
+        if path.endswith('.parquet'):
+            return self.get_dataframe_from_parquet(path=path)
+        
+        return self.get_dataframe_from_csv(path=path)
+
+    def upload_dataframe_as_parquet(self, path: str, df: 'pd.DataFrame') -> None:
+        """Uploads a dataframe as Snappy compressed Parquet file to an S3 bucket.
+            The column types are stored with the data, so it is read back without parsing or type inference.
+
+        Args:
+            path (str): Where the object will be stored in the bucket.
+            df (pd.DataFrame): The data to upload.
+            
+        Returns:
+            None
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        
+        parquet_buffer = pa.BufferOutputStream()
+        pq.write_table(table, parquet_buffer, compression='snappy')
+        body = parquet_buffer.getvalue()
+        
+        self.client.upload_fileobj(
+            pa.BufferReader(body),
+            self.bucket,
+            path,
+            ExtraArgs={'ContentType': 'application/vnd.apache.parquet', **self.extra_args},
+            Config=self.transfer_config
+        )
+        
+        logger.info(f"Dataset uploaded to {self.bucket}/{path}")
+        return
+
+    def upload_dataframe_as_csv(self, path: str, df: 'pd.DataFrame') -> None:
+        """Uploads a dataframe as CSV file to an S3 bucket.
+            The CSV is written by the Arrow writer into a native buffer, which is uploaded in parallel parts when it is large.
 
         Args:
             path (str): Where the object will be stored in the bucket.
-            df (pd.DataFrame): The data to upload. Can be a string or bytes.
+            df (pd.DataFrame): The data to upload.
             
         Returns:
             None
         """
-        csv_buffer = io.StringIO()
-        df.to_csv(csv_buffer, index=False)
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+        
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        
+        csv_buffer = pa.BufferOutputStream()
+        pacsv.write_csv(table, csv_buffer, write_options=pacsv.WriteOptions(quoting_style='needed'))
         body = csv_buffer.getvalue()
         
-        self.client.put_object(
-            Bucket=self.bucket,
-            Key=path,
-            Body=body,
-            ContentType='text/csv'
+        self.client.upload_fileobj(
+            pa.BufferReader(body),
+            self.bucket,
+            path,
+            ExtraArgs={'ContentType': 'text/csv', **self.extra_args},
+            Config=self.transfer_config
         )
         
         logger.info(f"Dataset uploaded to {self.bucket}/{path}")
@@ -191,19 +510,34 @@ class StorageS3:
 
 
     def upload_model(self, local_path: str, remote_dir: str) -> str:
-        """Upload local model from temp directory into remote S3 directory
+        """Upload local model from temp directory into remote S3 directory.
+            A model saved as a directory of artifacts is uploaded file by file in parallel, keeping its layout.
+            The latest pointer only names single-file models, since the served model is downloaded as one object.
 
         Args:
-            local_dir (str): Local temporary directory
+            local_path (str): Local model file or directory
             remote_dir (str): Remote S3 directory
             
         Returns:
             str: Path to the uploaded model
         """
-        model_name = os.path.basename(local_path)
+        model_name = os.path.basename(local_path.rstrip(os.sep))
         remote_path = os.path.join(remote_dir, model_name)
         
-        self.client.upload_file(local_path, self.bucket, remote_path)        
+        def upload_file(file_path: str) -> None:
+            file_key = remote_path if file_path == local_path else os.path.join(remote_path, os.path.relpath(file_path, local_path))
+            self.client.upload_file(file_path, self.bucket, file_key, ExtraArgs=self.extra_args, Config=self.transfer_config)
+        
+        if os.path.isdir(local_path):
+            file_paths = [os.path.join(root, file_name) for root, _, file_names in os.walk(local_path) for file_name in file_names]
+            with ThreadPoolExecutor(max_workers=Def.DB.Connection.MAX_WORKERS, thread_name_prefix='s3-upload') as pool:
+                list(pool.map(upload_file, file_paths))
+        else:
+            upload_file(local_path)
+            
+            if remote_dir in Def.DB.LATEST_POINTERS:
+                self._write_latest_pointer(prefix=remote_dir, key=remote_path)
+        
         logger.info(Def.Label.Model.UPLOADED_SUCCESSFULLY)
         
         return remote_path
@@ -227,11 +561,71 @@ class StorageS3:
         if not os.path.exists(local_dir_path):
             os.makedirs(local_dir_path)
 
-        self.client.download_file(self.bucket, latest_model_file, local_path)
+        self.client.download_file(self.bucket, latest_model_file, local_path, Config=self.transfer_config)
         logger.info(f'{Def.Label.Model.DOWNLOADED_SUCCESSFULLY}: {local_path}')
         
         return local_path
 
+    def download_model_bytes(self, remote_dir: str) -> io.BytesIO:
+        """Download the latest model file from the remote directory into memory.
+
+        Args:
+            remote_dir (str): Remote directory on S3.
+
+        Returns:
+            io.BytesIO: Content of the latest model, positioned at the start
+        """
+        latest_model_file = self.find_latest_file(prefix=remote_dir)
+        if latest_model_file is None:
+            raise ValueError('No files found in the remote directory.')
+        
+        buffer = io.BytesIO(self._get_object_ranges(key=latest_model_file))
+        logger.info(f'{Def.Label.Model.DOWNLOADED_SUCCESSFULLY}: {latest_model_file}')
+        
+        return buffer
+
+    def _get_object_ranges(self, key: str) -> bytes:
+        """Download an object with parallel ranged GET requests.
+            The first range also reports the object size, so small objects take a single request
+            and the rest of a large object is fetched concurrently.
+            The remaining ranges must match the ETag of the first one, so an object overwritten meanwhile
+            fails the download instead of mixing two versions.
+
+        Args:
+            key (str): Key of the object
+
+        Returns:
+            bytes: Content of the object
+        """
+        part_size = Def.DB.Transfer.CHUNK_SIZE
+
+        def get_range(start: int, **kwargs: Any) -> dict:
+            return self.client.get_object(Bucket=self.bucket, Key=key, Range=f'bytes={start}-{start + part_size - 1}', **kwargs)
+
+        try:
+            first_response = get_range(start=0)
+        except ClientError as ex:
+            # An empty object has no byte range to return
+            if ex.response['Error']['Code'] != 'InvalidRange':
+                raise
+            return b''
+
+        first_part = first_response['Body'].read()
+        if 'ContentRange' not in first_response:
+            return first_part
+        
+        size = int(first_response['ContentRange'].rpartition('/')[2])
+        if size <= part_size:
+            return first_part
+
+        def get_part(start: int) -> bytes:
+            return get_range(start=start, IfMatch=first_response['ETag'])['Body'].read()
+
+        with ThreadPoolExecutor(max_workers=Def.DB.Transfer.MAX_CONCURRENCY, thread_name_prefix='s3-range') as pool:
+            parts = list(pool.map(get_part, range(part_size, size, part_size)))
+
+        return b''.join([first_part, *parts])
+
     def get_latest_model_dir(self, base_path: str) -> str:
         """Find the latest model directory based on timestamp
 
@@ -239,18 +633,16 @@ class StorageS3:
             base_path (str): Base path to find the latest model
 
         Returns:
-            str: Latest model path
+            str: Latest model path, or None if there are no model directories
         """
-        folders = set()
+        latest_dir = None
         paginator = self.client.get_paginator('list_objects_v2')
 
-        for page in paginator.paginate(Bucket=self.bucket, Prefix=f'{base_path}/', Delimiter='/'):
-            if 'CommonPrefixes' in page:
-                for prefix_info in page['CommonPrefixes']:
-                    folder_name = prefix_info['Prefix'].rstrip('/').split('/')[-1]
-                    folders.add(folder_name)
-
-        sorted_folders = sorted(list(folders))
-        latest_dir = sorted_folders[-1]
+        # Pages depend on the previous continuation token, so they are fetched in sequence and only the running maximum is kept
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=base_path.rstrip('/') + '/', Delimiter='/'):
+            for prefix_info in page.get('CommonPrefixes', []):
+                folder_name = prefix_info['Prefix'].rstrip('/').rpartition('/')[2]
+                if latest_dir is None or folder_name > latest_dir:
+                    latest_dir = folder_name
 
         return latest_dir
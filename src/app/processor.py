@@ -1,10 +1,6 @@
 """Data Processor"""
 
-import os
-import sys
-sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', '..'))
-
-import json
+import orjson
 
 from loguru import logger
 from typing import Dict, Any
@@ -41,25 +37,28 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
         # Process dataset
         dataset = DatasetManager(path='s3-storage', target='Price', df=latest_df, is_inference=False)
+        
+        # Keep the raw dataset referenced only by the manager, so it is released as soon as it is prepared
+        del latest_df
         dataset.execute_preparation(to_save=False)
         df_processed = dataset.df
 
         # Save dataset
         dataset_name = latest_dataset_path.split('/')[-1][:-4]
-        dataset_path = f'data/processed/{dataset_name}_processed.csv'
-        storage.upload_dataframe_as_csv(path=dataset_path, df=df_processed)
+        dataset_path = f'data/processed/{dataset_name}_processed.parquet'
+        storage.upload_dataframe_as_parquet(path=dataset_path, df=df_processed)
 
         # Response
         response = {
             'statusCode': HTTPStatus.OK,
-            'body': json.dumps(Def.Label.DataProcessor.PROCESSED_SUCCESSFULLY)
+            'body': orjson.dumps(Def.Label.DataProcessor.PROCESSED_SUCCESSFULLY).decode()
         }
         
     except Exception as ex:
         logger.error(str(ex))
         response = {
             'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR,
-            'body': json.dumps(Def.Label.DataProcessor.PROCESSED_FAILED)
+            'body': orjson.dumps(Def.Label.DataProcessor.PROCESSED_FAILED).decode()
         }
 
     return response
@@ -0,0 +1,83 @@
+"""Tests of the S3 storage"""
+
+import time
+import pytest
+
+from pathlib import Path
+from moto import mock_aws
+
+from src.app.database import StorageS3
+
+
+BUCKET = 'car-pricing-test'
+
+
+@pytest.fixture
+def storage() -> StorageS3:
+    """S3 storage with an empty mocked bucket"""
+    with mock_aws():
+        storage = StorageS3(bucket=BUCKET, region='us-east-1')
+        storage.client.create_bucket(Bucket=BUCKET)
+        yield storage
+
+
+def put_objects(storage: StorageS3, keys: list[str]) -> None:
+    """Put empty objects in the given order, with distinct modification times"""
+    for key in keys:
+        storage.client.put_object(Bucket=BUCKET, Key=key, Body=b'')
+        time.sleep(1)
+    return
+
+
+def test_latest_dataset_is_newest_timestamped_key(storage: StorageS3) -> None:
+    """The newest dataset is found even though its key sorts before an older key without a timestamp"""
+    put_objects(storage, [
+        'data/processed/car-data_processed.parquet',
+        'data/processed/car-data_2026-10-15_10:00:00_processed.parquet',
+    ])
+    assert storage.find_latest_file(prefix='data/processed') == 'data/processed/car-data_2026-10-15_10:00:00_processed.parquet'
+
+
+def test_latest_dataset_is_newest_untimestamped_key(storage: StorageS3) -> None:
+    """The newest dataset is found even though its key has no timestamp"""
+    put_objects(storage, [
+        'data/raw/car-data_2026-10-15_10:00:00.csv',
+        'data/raw/car-data.csv',
+    ])
+    assert storage.find_latest_file(prefix='data/raw') == 'data/raw/car-data.csv'
+
+
+def test_latest_dataset_ignores_newer_sub_directory_name(storage: StorageS3) -> None:
+    """A sub-directory whose name sorts last does not win when it holds an older file"""
+    put_objects(storage, [
+        'data/raw/zz/car-data.csv',
+        'data/raw/car-data_2026-10-15_10:00:00.csv',
+    ])
+    assert storage.find_latest_file(prefix='data/raw') == 'data/raw/car-data_2026-10-15_10:00:00.csv'
+
+
+def test_latest_model_is_greatest_key(storage: StorageS3) -> None:
+    """Model keys embed timestamps, so the greatest key is the latest model regardless of upload order"""
+    put_objects(storage, [
+        'models/model_2026-10-15T10:00:00.pkl',
+        'models/model_2026-10-14T10:00:00.pkl',
+    ])
+    assert storage.find_latest_file(prefix='models') == 'models/model_2026-10-15T10:00:00.pkl'
+
+
+def test_latest_model_after_directory_upload(storage: StorageS3, tmp_path: Path) -> None:
+    """A model directory keeps its layout and does not move the pointer, so the served model stays downloadable"""
+    model_file = tmp_path / 'model_2026-10-14T10:00:00.pkl'
+    model_file.write_bytes(b'model')
+    storage.upload_model(local_path=str(model_file), remote_dir='models')
+
+    model_dir = tmp_path / 'model_2026-10-15T10:00:00'
+    (model_dir / 'estimator').mkdir(parents=True)
+    (model_dir / 'preprocessor.pkl').write_bytes(b'preprocessor')
+    (model_dir / 'estimator' / 'booster.ubj').write_bytes(b'booster')
+    remote_path = storage.upload_model(local_path=str(model_dir), remote_dir='models')
+
+    keys = [item['Key'] for item in storage.client.list_objects_v2(Bucket=BUCKET, Prefix=remote_path + '/')['Contents']]
+    assert sorted(keys) == [f'{remote_path}/estimator/booster.ubj', f'{remote_path}/preprocessor.pkl']
+    assert storage.find_latest_file(prefix='models') == 'models/model_2026-10-14T10:00:00.pkl'
+    assert storage.download_model_bytes(remote_dir='models').read() == b'model'
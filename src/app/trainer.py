@@ -1,10 +1,6 @@
 """Model Training"""
 
-import os
-import sys
-sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', '..'))
-
-import json
+import orjson
 import traceback
 
 from loguru import logger
@@ -39,7 +35,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     try:
         # Find the latest dataset
         latest_dataset_path = storage.find_latest_file(prefix='data/processed')    
-        latest_df = storage.get_dataframe_from_csv(path=latest_dataset_path)
+        latest_df = storage.get_dataframe(path=latest_dataset_path)
     
         # Prepare dataset
         dataset = DatasetManager(
@@ -69,7 +65,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
         response = {
             'statusCode': HTTPStatus.OK,
-            'body': json.dumps(content)
+            'body': orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY).decode()
         }
         
     except Exception as ex:
@@ -77,7 +73,7 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         logger.error(traceback.format_exc())
         response = {
             'statusCode': HTTPStatus.INTERNAL_SERVER_ERROR,
-            'body': json.dumps(Def.Label.DataProcessor.PROCESSED_FAILED)
+            'body': orjson.dumps(Def.Label.DataProcessor.PROCESSED_FAILED).decode()
         }
 
     return response
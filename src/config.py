@@ -2,6 +2,7 @@ import os
 import sys
 
 import json
+import functools
 from loguru import logger
 from dotenv import dotenv_values
 
@@ -71,7 +72,6 @@ def find_env_file(env: str, root_dir: str) -> str:
 
 # Path
 ROOT_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..')
-sys.path.insert(0, ROOT_DIR)
 
 # Environment
 ENVIRONMENT = load_config('.env', ROOT_DIR)['ENVIRONMENT']
@@ -99,7 +99,27 @@ class Def:
         """Database variables"""
         S3_BUCKET = config['S3_BUCKET']
         VERSION_DIR = 'version'
+        LATEST_DIR = 'latest'
+        # Prefixes whose keys embed sortable timestamps, other prefixes are resolved by modification time
+        SORTED_PREFIXES = ('models',)
+        # Prefixes resolved by a pointer object written on upload, `make push_models` removes the models pointer
+        LATEST_POINTERS = ('models',)
         EMPTY = -1
+        LATEST_TTL = 30
+        
+        class Connection:
+            """Client connection parameters"""
+            MAX_POOL_CONNECTIONS = 50
+            MAX_ATTEMPTS = 10
+            CONNECT_TIMEOUT = 3
+            READ_TIMEOUT = 30
+            MAX_WORKERS = 16
+        
+        class Transfer:
+            """Multipart transfer parameters"""
+            MULTIPART_THRESHOLD = 8 * 1024 * 1024
+            CHUNK_SIZE = 16 * 1024 * 1024
+            MAX_CONCURRENCY = 16
         
     class Data:
         """Data"""
@@ -120,11 +140,26 @@ class Def:
             IQR_THRESHOLD_MILEAGE = 3
             IQR_THRESHOLD_PRICE = 7.5
         
-        with open(os.path.join(ROOT_DIR, 'src', 'data', 'validator.json'), 'r') as f:
-            VALIDATOR = json.load(f)
+        # Features stored with units in the raw dataset, which are parsed during preprocessing
+        RAW_TEXT_FEATURES = ('Mileage', 'Engine volume')
+        
+        @staticmethod
+        @functools.lru_cache(maxsize=None)
+        def validator() -> dict[str, dict]:
+            """Load the feature validator on first use and reuse it afterwards
+
+            Returns:
+                dict[str, dict]: Type and allowed values or range per feature
+            """
+            with open(os.path.join(ROOT_DIR, 'src', 'data', 'validator.json'), 'r') as f:
+                return json.load(f)
         
     class Model:
         """Models"""        
+        REFRESH_SEC = 60
+        BATCH_SIZE = 32
+        BATCH_WAIT_SEC = 0.01
+        
         class Dir:
             """Directory"""
             MAIN = os.path.join(ROOT_DIR, 'models')
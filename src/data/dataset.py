@@ -1,17 +1,16 @@
 """Dataset Manager"""
 
 import os
-import sys
-sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', '..'))
-
 import argparse
+import functools
+import numpy as np
 import pandas as pd
 
 from loguru import logger
 from sklearn.model_selection import train_test_split
 
 from src.config import Def
-from src.utils.utilities import UtilityManager
+from src.utils.utilities import find_outliers_categorical, find_outliers_numeric, validate_feature_value
 
 
 class DatasetManager:
@@ -40,18 +39,102 @@ class DatasetManager:
         self.df = df
         self.is_inference = is_inference
         
-        self.train_data = None
-        self.test_data = None
+        self.train_idx = None
+        self.test_idx = None
         
         self.is_loaded = self.df is not None
         self.is_processed = False
         
-        self.relevant_features = list(Def.Data.VALIDATOR.keys())
-        self.categorical_features = [col for col, info in Def.Data.VALIDATOR.items() if info['type'] == 'categorical']
-        self.numerical_features = [col for col, info in Def.Data.VALIDATOR.items() if info['type'] == 'numerical']
-        self.binary_features = [col for col, info in Def.Data.VALIDATOR.items() if info['type'] == 'logical']
+        relevant_features, categorical_features, numerical_features, binary_features = DatasetManager.get_feature_groups()
+        self.relevant_features = list(relevant_features)
+        self.categorical_features = list(categorical_features)
+        self.numerical_features = list(numerical_features)
+        self.binary_features = list(binary_features)
+        return
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def get_feature_groups() -> tuple[tuple[str, ...], ...]:
+        """Returns feature names grouped by type, read from the validator once and reused by all instances
+
+        Returns:
+            tuple[tuple[str, ...], ...]: Relevant, categorical, numerical and binary features
+        """
+        validator = Def.Data.validator()
+        relevant_features = tuple(validator.keys())
+        categorical_features = tuple(col for col, info in validator.items() if info['type'] == 'categorical')
+        numerical_features = tuple(col for col, info in validator.items() if info['type'] == 'numerical')
+        binary_features = tuple(col for col, info in validator.items() if info['type'] == 'logical')
+        return relevant_features, categorical_features, numerical_features, binary_features
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def get_prepared_dtypes(target: str, is_inference: bool) -> dict[str, str]:
+        """Returns types of the prepared features, in the order of relevant features.
+            Categorical and binary features are stored as category codes and numerical features as 64-bit floats,
+            so models with scaling steps see the same values during the training and the inference.
+            The target is left out during the inference.
+
+        Args:
+            target (str): Target feature
+            is_inference (bool): Whether is inference process or not
+
+        Returns:
+            dict[str, str]: Type per prepared feature
+        """
+        relevant_features, _, numerical_features, _ = DatasetManager.get_feature_groups()
+        
+        dtypes = {}
+        for feature in relevant_features:
+            if feature == target and is_inference:
+                continue
+            if feature in numerical_features:
+                dtypes[feature] = 'float64'
+            else:
+                dtypes[feature] = 'category'
+        return dtypes
+
+    @staticmethod
+    def validate_instance(df: pd.DataFrame, is_inference: bool = True) -> None:
+        """Validate feature values of the first row in the given dataset
+
+        Args:
+            df (pd.DataFrame): Dataset, which contains exactly one row during the inference
+            is_inference (bool, optional): Whether is inference process or not. Defaults to True.
+
+        Raises:
+            ValueError: If the instance is not a single row during the inference, or any of its values is invalid
+
+        Returns:
+            None
+        """
+        if is_inference and df.shape[0] != 1:
+            raise ValueError("The instance should contain exactly one row for validation during the inference")
+
+        row = next(df.itertuples(index=False, name=None))
+        for feature, value in zip(df.columns, row):
+            if not validate_feature_value(feature, value):
+                raise ValueError(f"Invalid value '{value}' for feature '{feature}'")
         return
 
+    @staticmethod
+    def prepare_instance(df: pd.DataFrame, target: str) -> pd.DataFrame:
+        """Prepare instance for the inference without creating a dataset manager,
+            with the same validation, feature selection and types as `execute_preparation`
+
+        Args:
+            df (pd.DataFrame): Raw instance with a single row
+            target (str): Target feature, which is not part of the prepared instance
+
+        Returns:
+            pd.DataFrame: Prepared instance
+        """
+        DatasetManager.validate_instance(df)
+        
+        dtypes = DatasetManager.get_prepared_dtypes(target, True)
+        prepared_df = df[list(dtypes)].astype(dtypes)
+        return prepared_df
+
     @staticmethod
     def get_raw_path() -> str:
         """Returns path to the raw dataset
@@ -72,9 +155,70 @@ class DatasetManager:
         path = os.path.join(Def.Data.Dir.PROCESSED, 'car-data-processed.csv')
         return path
 
+    @staticmethod
+    def get_processed_parquet_path() -> str:
+        """Returns path to the processed dataset cached as Parquet, which keeps the prepared types
+
+        Returns:
+            str: Path of processed dataset in Parquet format
+        """
+        path = os.path.join(Def.Data.Dir.PROCESSED, 'car-data-processed.parquet')
+        return path
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def get_load_dtypes(target: str, is_processed: bool) -> dict[str, str]:
+        """Returns types to parse the stored dataset with, so the parser does not infer them.
+            The processed dataset is parsed straight into the prepared types. Raw features with units
+            are left to the parser in the raw dataset, since they are converted during preprocessing.
+
+        Args:
+            target (str): Target feature
+            is_processed (bool): Whether the stored dataset is already processed or not
+
+        Returns:
+            dict[str, str]: Type per feature
+        """
+        prepared_dtypes = DatasetManager.get_prepared_dtypes(target, False)
+        if is_processed:
+            return prepared_dtypes
+        
+        dtypes = {
+            feature: dtype for feature, dtype in prepared_dtypes.items()
+            if feature not in Def.Data.RAW_TEXT_FEATURES
+        }
+        return dtypes
+
     def load(self) -> None:
-        """Load dataset"""
-        self.df = pd.read_csv(self.path, header=0)
+        """Load dataset, reading only the relevant features with their known types.
+            The processed dataset is read from its Parquet cache when it is not older than the CSV.
+        """
+        is_processed = os.path.abspath(self.path) == os.path.abspath(DatasetManager.get_processed_path())
+        
+        parquet_path = DatasetManager.get_processed_parquet_path()
+        if (
+            is_processed
+            and os.path.exists(parquet_path)
+            and os.path.getmtime(parquet_path) >= os.path.getmtime(self.path)
+        ):
+            self.df = pd.read_parquet(parquet_path, engine='pyarrow')
+            self.df = self.df[[column for column in self.df.columns if column in self.relevant_features]]
+            self.set_types()
+            self.is_loaded = True
+            logger.info(f'Loaded processed data from cache: {parquet_path}')
+            return
+        
+        # PyArrow engine accepts only existing column names, so intersect them with the header
+        relevant_features = set(self.relevant_features)
+        columns = [column for column in pd.read_csv(self.path, nrows=0).columns if column in relevant_features]
+        
+        self.df = pd.read_csv(
+            self.path,
+            header=0,
+            usecols=columns,
+            dtype=DatasetManager.get_load_dtypes(self.target, is_processed),
+            engine='pyarrow'
+        )
         self.is_loaded = True
         return
 
@@ -95,99 +239,60 @@ class DatasetManager:
 
     def preprocess(self) -> None:
         """Preprocess features"""
-        self.df['Mileage'] = self.df['Mileage'].str.replace(' km', '').astype(int)
-        self.df['Engine volume'] = self.df['Engine volume'].str.replace(' Turbo', '').astype(float)
+        self.df['Mileage'] = pd.to_numeric(self.df['Mileage'].str.removesuffix(' km'), downcast='integer')
+        # Reuse the turbo flag, so only the turbo rows are stripped of the suffix
+        engine_volume = self.df['Engine volume'].copy()
+        is_turbo = self.df['isTurbo'].to_numpy() == 'Yes'
+        engine_volume[is_turbo] = engine_volume[is_turbo].str[:-len(' Turbo')]
+        self.df['Engine volume'] = pd.to_numeric(engine_volume)
         return
 
     def add_features(self) -> None:
         """Exnted dataset with new features"""
-        self.df['isTurbo'] = self.df['Engine volume'].apply(lambda x: 'Yes' if 'Turbo' in x else 'No')
+        self.df['isTurbo'] = np.where(self.df['Engine volume'].str.endswith(' Turbo', na=False), 'Yes', 'No')
         return
 
     def clean_data(self) -> None:
-        """Data cleaning and validation"""
-        # Make
-        feature = 'Manufacturer'
-        outliers_make = UtilityManager.Data.find_outliers_categorical(
-            self.df,
-            feature,
-            min_freq=Def.Data.Param.MIN_FREQ_MAKE
-        )
-        self.df = self.df.drop(outliers_make.index).reset_index(drop=True)
-        
-        # Model
-        feature = 'Model'
-        outliers_model = UtilityManager.Data.find_outliers_categorical(
-            self.df,
-            feature,
-            min_freq=Def.Data.Param.MIN_FREQ_MODEL
-        )
-        self.df = self.df.drop(outliers_model.index).reset_index(drop=True)
-        
-        # Production year
-        feature = 'Prod. year'
-        outliers_prodyear = UtilityManager.Data.find_outliers_numeric(
-            self.df,
-            feature=feature,
-            iqr_threshold=Def.Data.Param.IQR_THRESHOLD_PROD_YEAR,
-            min_value=Def.Data.VALIDATOR[feature]['min'],
-            max_value=Def.Data.VALIDATOR[feature]['max'],
-        )
-        self.df = self.df.drop(outliers_prodyear.index).reset_index(drop=True)
+        """Data cleaning and validation.
+            Each detector sees only the rows kept by the previous ones, and the dataset is filtered once at the end.
+        """
+        def bounds(feature: str) -> dict[str, float]:
+            return {
+                'min_value': Def.Data.validator()[feature]['min'],
+                'max_value': Def.Data.validator()[feature]['max'],
+            }
         
-        # Body category
-        feature = 'Category'
-        outliers_body = UtilityManager.Data.find_outliers_categorical(
-            self.df,
-            feature,
-            min_freq=Def.Data.Param.MIN_FREQ_BODY_CATEGORY
+        # Outlier detectors in the order of application
+        detectors = (
+            ('Manufacturer', find_outliers_categorical, {'min_freq': Def.Data.Param.MIN_FREQ_MAKE}),
+            ('Model', find_outliers_categorical, {'min_freq': Def.Data.Param.MIN_FREQ_MODEL}),
+            ('Prod. year', find_outliers_numeric, {'iqr_threshold': Def.Data.Param.IQR_THRESHOLD_PROD_YEAR, **bounds('Prod. year')}),
+            ('Category', find_outliers_categorical, {'min_freq': Def.Data.Param.MIN_FREQ_BODY_CATEGORY}),
+            ('Mileage', find_outliers_numeric, {'iqr_threshold': Def.Data.Param.IQR_THRESHOLD_MILEAGE, **bounds('Mileage')}),
+            ('Price', find_outliers_numeric, {'iqr_threshold': Def.Data.Param.IQR_THRESHOLD_PRICE, **bounds('Price')}),
         )
-        self.df = self.df.drop(outliers_body.index).reset_index(drop=True)
         
-        # Mileage
-        feature = 'Mileage'
-        outliers_mileage = UtilityManager.Data.find_outliers_numeric(
-            self.df,
-            feature=feature,
-            iqr_threshold=Def.Data.Param.IQR_THRESHOLD_MILEAGE,
-            min_value=Def.Data.VALIDATOR[feature]['min'],
-            max_value=Def.Data.VALIDATOR[feature]['max'],
-        )
-        self.df = self.df.drop(outliers_mileage.index).reset_index(drop=True)
+        keep = np.ones(len(self.df), dtype=bool)
+        for feature, find_outliers, params in detectors:
+            outliers = find_outliers(self.df.loc[keep, [feature]], feature, **params, as_mask=True)
+            keep[keep] = ~outliers
         
-        # Car Price
-        feature = 'Price'
-        outliers_price = UtilityManager.Data.find_outliers_numeric(
-            self.df,
-            feature=feature,
-            iqr_threshold=Def.Data.Param.IQR_THRESHOLD_PRICE,
-            min_value=Def.Data.VALIDATOR[feature]['min'],
-            max_value=Def.Data.VALIDATOR[feature]['max'],
-        )
-        self.df = self.df.drop(outliers_price.index).reset_index(drop=True)
+        self.df = self.df[keep].reset_index(drop=True)
         return
 
     def validate_data(self) -> None:
         """Validate data"""
-        if self.is_inference and self.df.shape[0] != 1:
-            raise ValueError("The instance should contain exactly one row for validation during the inference")
-
-        for feature in self.df.columns:            
-            value = self.df.iloc[0][feature]
-            if not UtilityManager.Data.Validator.validate_feature_value(feature, value):
-                raise ValueError(f"Invalid value '{value}' for feature '{feature}'")
+        DatasetManager.validate_instance(self.df, self.is_inference)
         return
 
     def set_types(self) -> None:
-        """Set types for features"""
-        for feature in self.numerical_features:
-            if self.is_inference and feature == self.target:
-                continue
-            self.df[feature] = self.df[feature].astype(float)
-
-        self.df[self.categorical_features] = self.df[self.categorical_features].astype(str)
-
-        self.df[self.binary_features] = self.df[self.binary_features].astype(str)
+        """Set types for features in a single pass over the dataset.
+            Categories of values removed by cleaning are dropped, so the saved copies of the dataset keep the same ones.
+        """
+        self.df = self.df.astype(DatasetManager.get_prepared_dtypes(self.target, self.is_inference))
+        
+        for feature in self.df.select_dtypes('category').columns:
+            self.df[feature] = self.df[feature].cat.remove_unused_categories()
         return
 
     def execute_preparation(self, to_save: bool = False) -> pd.DataFrame:
@@ -203,6 +308,9 @@ class DatasetManager:
             # Validation
             self.validate_data()
         else:
+            # Keep only relevant raw features, so the steps below do not copy unused columns
+            self.df = self.df.drop(columns=self.df.columns.difference(self.relevant_features))
+            
             # Add features
             self.add_features()
             
@@ -223,6 +331,10 @@ class DatasetManager:
             path = DatasetManager.get_processed_path()
             self.df.to_csv(path, index=False)
             logger.info(f'Saved processed data at: {path}')
+            
+            path = DatasetManager.get_processed_parquet_path()
+            self.df.to_parquet(path, engine='pyarrow', compression='zstd', index=False)
+            logger.info(f'Cached processed data at: {path}')
         
         # Set flag
         self.is_processed = True
@@ -230,7 +342,8 @@ class DatasetManager:
         return self.df
 
     def split(self, test_size: float = 0.2) -> None:
-        """Split processed dataset into sets for training and testing
+        """Split processed dataset into sets for training and testing.
+            Only row positions of the sets are kept, so the dataset is not copied until its rows are selected.
 
         Args:
             test_size (float, optional): Test size portion. Defaults to 0.2.
@@ -238,9 +351,24 @@ class DatasetManager:
         Returns:
             None
         """
-        self.train_data, self.test_data = train_test_split(self.df, test_size=test_size, random_state=Def.Env.SEED)
+        positions = np.arange(len(self.df))
+        self.train_idx, self.test_idx = train_test_split(positions, test_size=test_size, random_state=Def.Env.SEED)
         return
 
+    def get_input_target(self, indices: np.ndarray) -> tuple[pd.DataFrame, pd.Series]:
+        """Select input features and target for the given rows, copying each of them once
+
+        Args:
+            indices (np.ndarray): Row positions, e.g. of the training or testing set
+
+        Returns:
+            tuple[pd.DataFrame, pd.Series]: Input features and target
+        """
+        input_columns = self.df.columns.get_indexer(self.df.columns.drop(self.target))
+        input_data = self.df.iloc[indices, input_columns]
+        target_data = self.df[self.target].iloc[indices]
+        return input_data, target_data
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -1,20 +1,17 @@
 """Model"""
 
 import os
-import sys
-sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', '..'))
-
-import pickle
+import joblib
 import argparse
+import numpy as np
 import pandas as pd
 
+from typing import Any, BinaryIO, Union
 from loguru import logger
 from datetime import datetime
 from xgboost import XGBRegressor
 from category_encoders import TargetEncoder, BinaryEncoder
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 
 from src.config import Def
 from src.data.dataset import DatasetManager
@@ -57,12 +54,43 @@ class PricingModel:
         # Ensure path
         os.makedirs(os.path.dirname(path), exist_ok=True)
 
-        # Save model
-        with open(path, 'wb') as file:
-            pickle.dump(self.predictor, file)
+        # Save model uncompressed, so its arrays can be memory-mapped on load
+        joblib.dump(self.get_artifact(), path)
         logger.info(f'Model saved to path: {path}')
         return
     
+    def get_artifact(self) -> dict[str, Any]:
+        """Returns stored form of the predictor, where the preprocessing steps are kept separately
+            from the estimator, which is saved in the native XGBoost UBJSON format
+
+        Returns:
+            dict[str, Any]: Preprocessing pipeline and raw estimator
+        """
+        artifact = {
+            'preprocessor': Pipeline(steps=self.predictor.steps[:-1]),
+            'estimator': bytes(self.predictor.named_steps['estimator'].get_booster().save_raw(raw_format='ubj'))
+        }
+        return artifact
+
+    def set_artifact(self, artifact: Union[dict[str, Any], Pipeline]) -> None:
+        """Restore predictor from its stored form
+
+        Args:
+            artifact (Union[dict[str, Any], Pipeline]): Preprocessing pipeline with raw estimator,
+                or the whole pickled pipeline of the models saved before
+            
+        Returns:
+            None
+        """
+        if isinstance(artifact, Pipeline):
+            self.predictor = artifact
+            return
+        
+        estimator = XGBRegressor()
+        estimator.load_model(bytearray(artifact['estimator']))
+        self.predictor = Pipeline(steps=[*artifact['preprocessor'].steps, ('estimator', estimator)])
+        return
+
     def load(self, path: str) -> None:
         """Load predictor at given path
 
@@ -72,29 +100,42 @@ class PricingModel:
         Returns:
             None
         """
-        with open(path, 'rb') as file:
-            self.predictor = pickle.load(file)
+        self.set_artifact(joblib.load(path, mmap_mode='r'))
         logger.info(f'Loaded model from path: {path}')
         return
 
+    def load_fileobj(self, file: BinaryIO) -> None:
+        """Load predictor from the given binary file object
+
+        Args:
+            file (BinaryIO): Model content, e.g. downloaded into memory
+            
+        Returns:
+            None
+        """
+        self.set_artifact(joblib.load(file))
+        logger.info('Loaded model from file object')
+        return
+
     def train(self) -> None:
         """Train model"""
         # Pipelines
         self.predictor = Pipeline(steps=[
             ('cat_encoder', TargetEncoder(cols=self.dataset.categorical_features)),
             ('bin_encoder', BinaryEncoder(cols=self.dataset.binary_features)),
-            ('scaler', StandardScaler()),
             ('estimator', XGBRegressor(
                 objective='reg:squarederror',
+                tree_method='hist',
+                max_bin=256,
                 max_depth=10,
+                n_jobs=-1,
                 random_state=Def.Env.SEED,
                 verbosity=0
             ))
         ])
         
         # Fit predictor
-        input_data = self.dataset.train_data.drop(columns=[self.dataset.target])
-        target_data = self.dataset.train_data[self.dataset.target]
+        input_data, target_data = self.dataset.get_input_target(indices=self.dataset.train_idx)
         
         self.predictor.fit(X=input_data, y=target_data)
 
@@ -119,15 +160,26 @@ class PricingModel:
             raise ValueError(Def.Label.Model.NOT_LOADED_OR_TRAINED)
         
         # Make predictions on the test set
-        input_test_data = self.dataset.test_data.drop(columns=[self.dataset.target])
-        y_true = self.dataset.test_data[self.dataset.target]
+        input_test_data, y_true = self.dataset.get_input_target(indices=self.dataset.test_idx)
         
-        y_pred = self.predictor.predict(input_test_data)
+        y_pred = self.predictor.predict(input_test_data).astype(np.float64, copy=False)
+        y_true = y_true.to_numpy(dtype=np.float64)
 
-        # Calculate metrics
-        mse = mean_squared_error(y_true, y_pred)
-        mae = mean_absolute_error(y_true, y_pred)
-        r2 = r2_score(y_true, y_pred)
+        # Calculate metrics from the residuals, computed once
+        errors = y_true - y_pred
+        squared_errors = errors * errors
+        deviations = y_true - y_true.mean()
+        
+        mse = float(squared_errors.mean())
+        mae = float(np.abs(errors).mean())
+        
+        # Constant target has no variance to explain, it scores 1.0 for perfect predictions and 0.0 otherwise like r2_score
+        ss_res = float(squared_errors.sum())
+        ss_tot = float((deviations * deviations).sum())
+        if ss_tot == 0.0:
+            r2 = 1.0 if ss_res == 0.0 else 0.0
+        else:
+            r2 = 1.0 - ss_res / ss_tot
         
         # Results
         results = {
@@ -139,11 +191,13 @@ class PricingModel:
         
         return results
 
-    def predict(self, input_data: pd.DataFrame) -> list[int]:
+    def predict(self, input_data: pd.DataFrame, is_prepared: bool = False) -> list[int]:
         """Predict car price for given cars
 
         Args:
             input_data (pd.DataFrame): Car instances
+            is_prepared (bool, optional): Whether instances are already validated and prepared,
+                e.g. a batch of single rows prepared one by one. Defaults to False.
             
         Returns:
             (list[int]): Predicted car prices
@@ -152,9 +206,10 @@ class PricingModel:
             raise ValueError(Def.Label.Model.NOT_LOADED_OR_TRAINED)
         
         # Data workflow
-        input_dataset = DatasetManager(path='run-time', target='Price', df=input_data, is_inference=True)
-        input_dataset.execute_preparation()
-        input_df = input_dataset.df
+        if is_prepared:
+            input_df = input_data
+        else:
+            input_df = DatasetManager.prepare_instance(df=input_data, target='Price')
         
         # Predictions
         y_preds = self.predictor.predict(input_df)
@@ -1,18 +1,285 @@
 """Utility Manager"""
 
-import os
-import sys
-sys.path.insert(0, os.path.join(os.path.abspath(os.path.dirname(__file__)), '..', '..'))
+import math
+import orjson
+import functools
+import numpy as np
 
-import pandas as pd
-
-from typing import Union
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Callable, Optional, Union
 from loguru import logger
 from http import HTTPStatus
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response as RawResponse
 
 from src.config import Def, logger
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def find_outliers_numeric(
+        df: 'pd.DataFrame',
+        feature: str,
+        iqr_threshold: float,
+        min_value: float,
+        max_value: float,
+        as_mask: bool = False
+) -> Union['pd.DataFrame', np.ndarray]:
+    """Find outliers from the dataset based on given feature and paremeters
+
+    Args:
+        df (pd.DataFrame): Dataset
+        feature (str): Feature name
+        iqr_threshold (float): IQR threshold value
+        min_value (float): Min value of feature
+        max_value (float): Max value of feature
+        as_mask (bool, optional): Whether to return only the boolean mask of outliers,
+            so their rows are not copied. Defaults to False.
+
+    Returns:
+        Union[pd.DataFrame, np.ndarray]: Outliers, or their mask
+    """
+    # Arrow-backed columns are processed by Arrow compute kernels on their own buffers, without a copy into NumPy
+    column = df[feature]
+    is_arrow = hasattr(column.dtype, 'pyarrow_dtype')
+
+    # Identify bounds, both quartiles are found by one partition of the values, skipping missing ones
+    if is_arrow:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        values = pa.array(column.array)
+        quartiles = pc.quantile(values, q=[0.25, 0.75]).to_pylist()
+    else:
+        values = column.to_numpy()
+        quartiles = np.nanquantile(values, [0.25, 0.75])
+
+    q25, q75 = (int(round(q)) for q in quartiles)
+    iqr_value = q75 - q25
+
+    lower_bound = max(q25 - iqr_threshold * iqr_value, min_value)
+    upper_bound = min(q75 + iqr_threshold * iqr_value, max_value)
+
+    logger.info('{} < {} < {}', lower_bound, feature, upper_bound)
+
+    # Identify outliers, integer values are compared with equivalent integer bounds, so they are not cast to floats
+    if is_arrow:
+        mask_outliers = pc.or_(pc.less(values, lower_bound), pc.greater(values, upper_bound))
+        mask_outliers = mask_outliers.fill_null(False).to_numpy(zero_copy_only=False)
+    elif values.dtype.kind in 'iu':
+        mask_outliers = values < math.ceil(lower_bound)
+        mask_outliers |= values > math.floor(upper_bound)
+    else:
+        mask_outliers = values < lower_bound
+        mask_outliers |= values > upper_bound
+
+    total_data_points = mask_outliers.size
+    num_outliers = int(mask_outliers.sum())
+    percentage_outliers = (num_outliers / total_data_points) * 100
+
+    logger.info('Outlier for {}: {} or {:.2f}%', feature, num_outliers, percentage_outliers)
+    logger.info('Before {}, After {}', total_data_points, total_data_points - num_outliers)
+
+    if as_mask:
+        return mask_outliers
+
+    outliers = df.iloc[mask_outliers]
+    return outliers
+
+
+def find_outliers_categorical(
+        df: 'pd.DataFrame',
+        feature: str,
+        min_freq: int,
+        as_mask: bool = False
+) -> Union['pd.DataFrame', np.ndarray]:
+    """Find outliers for categorical feature under given minimum frequency
+
+    Args:
+        df (pd.DataFrame): Dataset
+        feature (str): Feature name
+        min_freq (int): Minimum frequency
+        as_mask (bool, optional): Whether to return only the boolean mask of outliers,
+            so their rows are not copied. Defaults to False.
+
+    Returns:
+        Union[pd.DataFrame, np.ndarray]: Outliers, or their mask
+    """
+    # Frequency of each row's value, the float conversion keeps missing values out of the outliers
+    values = df[feature]
+    if values.dtype == 'category':
+        codes, num_values = values.cat.codes.to_numpy(), len(values.cat.categories)
+    else:
+        codes, uniques = values.factorize()
+        num_values = len(uniques)
+
+    # Count integer codes, shifted by one so the missing code -1 gets its own slot
+    codes = codes + 1
+    counts = np.bincount(codes, minlength=num_values + 1).astype(float)
+    counts[0] = np.nan
+    frequency = counts[codes]
+
+    mask = frequency <= min_freq
+
+    total_data_points = mask.size
+    num_outliers = int(mask.sum())
+    percentage_outliers = (num_outliers / total_data_points) * 100
+
+    logger.info('Outlier for {}: {} or {:.2f}%', feature, num_outliers, percentage_outliers)
+
+    if as_mask:
+        return mask
+
+    outliers = df.iloc[mask]
+    return outliers
+
+
+def calc_stats(df, feature):
+    """Calculate statistics for given feature in the dataset"""
+    values = df[feature].to_numpy(dtype=np.float64)
+
+    # Min, quartiles and max are found by one partition of the values, skipping missing ones as pandas does
+    min_value, q25, q50, q75, max_value = np.nanquantile(values, [0.0, 0.25, 0.5, 0.75, 1.0])
+    mean_value = np.nanmean(values)
+    std_value = np.nanstd(values, ddof=1)
+
+    logger.info(
+        '\nStatistics for {}\nMean = {:.2f}\nStd = {:.2f}\nMin = {:.2f}\n'
+        '25th = {:.2f}\n50th = {:.2f}\n75th = {:.2f}\nMax = {:.2f}\nIQR = {:.2f}',
+        feature, mean_value, std_value, min_value, q25, q50, q75, max_value, q75 - q25
+    )
+    return
+
+
+@functools.lru_cache(maxsize=None)
+def get_allowed_values(feature: str) -> frozenset:
+    """Returns allowed values of the categorical or logical feature as a set, built once per feature
+
+    Args:
+        feature (str): Feature name
+
+    Returns:
+        frozenset: Allowed values
+    """
+    return frozenset(Def.Data.validator()[feature]["values"])
+
+
+@functools.lru_cache(maxsize=None)
+def get_value_checker(feature: str) -> Callable[[Union[str, int, float]], bool]:
+    """Returns check of a single value for the feature, specialized once per feature by its type,
+        so validation does not compare type names on every call
+
+    Args:
+        feature (str): Feature name
+
+    Raises:
+        ValueError: If feature is not in the Validator
+
+    Returns:
+        Callable[[Union[str, int, float]], bool]: Check which returns True if the value is valid
+    """
+    if feature not in Def.Data.validator():
+        raise ValueError(f"Feature '{feature}' is not valid")
+
+    feature_info = Def.Data.validator()[feature]
+
+    if feature_info["type"] in ("categorical", "logical"):
+        check = get_allowed_values(feature).__contains__
+    
+    elif feature_info["type"] == "numerical":
+        min_value, max_value = feature_info["min"], feature_info["max"]
+        
+        def check(value: Union[str, int, float]) -> bool:
+            return min_value <= value <= max_value
+
+    else:
+        def check(value: Union[str, int, float]) -> bool:
+            return False
+        
+    return check
+
+
+@functools.lru_cache(maxsize=4096)
+def validate_feature_value(feature: str, value: Union[str, int, float]) -> bool:
+    """Validate feature value, remembering the result for repeated pairs of feature and value
+
+    Args:
+        feature (str): Feature name
+        value (Union[str, int, float]): Feature value
+
+    Raises:
+        ValueError: If feature is not in the Validator
+
+    Returns:
+        bool: True if feature value is valid, otherwise False
+    """
+    is_valid = get_value_checker(feature)(value)
+    return is_valid
+
+
+# Default status codes as plain integers, so responses do not unwrap the enum on every call
+STATUS_OK = int(HTTPStatus.OK)
+STATUS_ERROR = int(HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
+@functools.lru_cache(maxsize=256)
+def render_message(key: str, message: str) -> bytes:
+    """
+    Serialize message under the given key, remembering the result for repeated messages
+    Args:
+        key (str): key of message, e.g. 'message' or 'error'
+        message (str): content of message
+    Returns:
+        bytes: message in json format
+    """
+    return orjson.dumps({key: message})
+
+
+def json_response_err(message: str, status: Optional[int] = None) -> RawResponse:
+    """
+    Create json response with error flag
+    Args:
+        message (str): content of message
+        status (Optional[int]): status of message, e.g. HTTPStatus. Defaults HTTPStatus.INTERNAL_SERVER_ERROR.
+    Returns:
+        RawResponse: response in json format for given message
+    """
+    if status is None:
+        status = STATUS_ERROR
+
+    content = render_message('error', message)
+    return RawResponse(content=content, status_code=status, media_type='application/json')
+
+
+def json_response_ok(message: str, status: Optional[int] = None) -> RawResponse:
+    """
+    Create valid json response with given message
+        Args:
+            message (str): content of message
+            status (Optional[int]): status of message, e.g. HTTPStatus. Defaults HTTPStatus.OK.
+        Returns:
+            RawResponse: response in json format for given message
+    """
+    if status is None:
+        status = STATUS_OK
+
+    content = render_message('message', message)
+    return RawResponse(content=content, status_code=status, media_type='application/json')
+
+
+def create_json_response(content: dict, status: Optional[int] = None) -> ORJSONResponse:
+    """
+    Create json response for given dictionary
+        Args:
+            content (dict): content in dict form
+            status (Optional[int]): status of message, e.g. HTTPStatus. Defaults HTTPStatus.OK.
+        Returns:
+            ORJSONResponse: json response for given dictionary
+    """
+    if status is None:
+        status = STATUS_OK
+
+    return ORJSONResponse(content=content, status_code=status)
+
 
 class UtilityManager:
     """Utility Manager"""
@@ -21,171 +288,23 @@ class UtilityManager:
         """Constructor"""
         return
     
-    class Data:
-        """Data Utilities"""
-        
-        def find_outliers_numeric(
-                df: pd.DataFrame,
-                feature: str,
-                iqr_threshold: float,
-                min_value: float,
-                max_value: float
-        ) -> pd.DataFrame:
-            """Find outliers from the dataset based on given feature and paremeters
-
-            Args:
-                df (pd.DataFrame): Dataset
-                feature (str): Feature name
-                iqr_threshold (float): IQR threshold value
-                min_value (float): Min value of feature
-                max_value (float): Max value of feature
-
-            Returns:
-                pd.DataFrame: Outliers
-            """
-            # Identify bounds
-            values = df[feature]
-            q25 = int(round(values.quantile(0.25)))
-            q75 = int(round(values.quantile(0.75)))
-            iqr_value = q75 - q25
-            
-            lower_bound = q25 - iqr_threshold * iqr_value
-            if lower_bound < min_value:
-                lower_bound = min_value
-
-            upper_bound = q75 + iqr_threshold * iqr_value
-            if upper_bound > max_value:
-                upper_bound = max_value
-
-            logger.info(f'{lower_bound} < {feature} < {upper_bound}')
-            
-            # Identify outliers
-            mask_outliers = (df[feature] < lower_bound) | (df[feature] > upper_bound)
-            outliers = df[mask_outliers]
-            
-            total_data_points = len(df)
-            num_outliers = len(outliers)
-            percentage_outliers = (num_outliers / total_data_points) * 100
-            
-            logger.info(f'Outlier for {feature}: {num_outliers} or {percentage_outliers:.2f}%')
-            logger.info(f'Before {total_data_points}, After {total_data_points - num_outliers}')
-            
-            return outliers
-                
-        def find_outliers_categorical(df: pd.DataFrame, feature: str, min_freq: int) -> pd.DataFrame:
-            """Find outliers for categorical feature under given minimum frequency
-
-            Args:
-                df (pd.DataFrame): Dataset
-                feature (str): Feature name
-                min_freq (int): Minimum frequency
-
-            Returns:
-                pd.DataFrame: Outliers
-            """
-            counts = df[feature].value_counts()
-            
-            mask = df[feature].isin(counts[counts <= min_freq].index)
-            outliers = df[mask]
-
-            total_data_points = len(df)
-            num_outliers = len(outliers)
-            percentage_outliers = (num_outliers / total_data_points) * 100
-            
-            logger.info(f'Outlier for {feature}: {num_outliers} or {percentage_outliers:.2f}%')
-            
-            return outliers
-
-        def calc_stats(df, feature):
-            """Calculate statistics for given feature in the dataset"""
-            values = df[feature]
-            logger.info(f'\nStatistics for {feature}')
-            logger.info(f'Mean = {values.mean():.2f}')
-            logger.info(f'Std = {values.std():.2f}')
-            logger.info(f'Min = {values.min():.2f}')
-            logger.info(f'25th = {values.quantile(0.25):.2f}')
-            logger.info(f'50th = {values.median():.2f}')
-            logger.info(f'75th = {values.quantile(0.75):.2f}')
-            logger.info(f'Max = {values.max():.2f}')
-            logger.info(f'IQR = {(values.quantile(0.75) - values.quantile(0.25)):.2f}')
-            return
-
-        class Validator:
-            """Validator utilities"""
-            
-            def validate_feature_value(feature: str, value: Union[str, int, float]) -> bool:
-                """Validate feature value
-
-                Args:
-                    feature (str): Feature name
-                    value (Union[str, int, float]): Feature value
-
-                Raises:
-                    ValueError: If feature is not in the Validator
-
-                Returns:
-                    bool: True if feature value is valid, otherwise False
-                """
-                if feature not in Def.Data.VALIDATOR:
-                    raise ValueError(f"Feature '{feature}' is not valid")
-
-                feature_info = Def.Data.VALIDATOR[feature]
-
-                if feature_info["type"] in ("categorical", "logical"):
-                    is_valid = value in feature_info["values"]
-                
-                elif feature_info["type"] in ("numerical"):
-                    is_valid = (feature_info["min"] <= value <= feature_info["max"])
-
-                else:
-                    is_valid = False
-                    
-                return is_valid
-
-    class Response:
-        """Response utilites"""
-
-        @staticmethod
-        def json_response_err(message: str, status: HTTPStatus) -> JSONResponse:
-            """
-            Create json response with error flag
-            Args:
-                message (str): content of message
-                status (HTTPStatus): status of message
-            Returns:
-                JSONResponse: response in json format for given message
-            """
-            if status is None:
-                status = HTTPStatus.INTERNAL_SERVER_ERROR
-                
-            return JSONResponse(content={'error': message}, status_code=status)
-        
-        @staticmethod
-        def json_response_ok(message: str, status: HTTPStatus=HTTPStatus.OK) -> JSONResponse:
-            """
-            Create valid json response with given message
-                Args:
-                    message (str): content of message
-                    status (HTTPStatus): status of message. Defaults HTTPStatus.OK.
-                Returns:
-                    JSONResponse: response in json format for given message
-            """
-            if status is None:
-                status = HTTPStatus.OK
-                
-            return JSONResponse(content={'message': message}, status_code=status)
-
-        @staticmethod
-        def create_json_response(content: dict, status: HTTPStatus=HTTPStatus.OK) -> JSONResponse:
-            """
-            Create json response for given dictionary
-                Args:
-                    content (dict): content in dict form
-                    status (HTTPStatus): status of message. Defaults HTTPStatus.OK.
-                Returns:
-                    JSONResponse: json response for given dictionary
-            """
-            if status is None:
-                status = HTTPStatus.OK
-                
-            return JSONResponse(content=content, status_code=status)
+    # Kept for callers of the namespaces, new code imports the functions from the module
+    Data = SimpleNamespace(
+        find_outliers_numeric=find_outliers_numeric,
+        find_outliers_categorical=find_outliers_categorical,
+        calc_stats=calc_stats,
+        Validator=SimpleNamespace(
+            get_allowed_values=get_allowed_values,
+            get_value_checker=get_value_checker,
+            validate_feature_value=validate_feature_value
+        )
+    )
+
+    Response = SimpleNamespace(
+        STATUS_OK=STATUS_OK,
+        STATUS_ERROR=STATUS_ERROR,
+        render_message=render_message,
+        json_response_err=json_response_err,
+        json_response_ok=json_response_ok,
+        create_json_response=create_json_response
+    )